@@ -1,6 +1,7 @@
-import json
 import os
+import heapq
 from datetime import datetime
+import orjson
 
 ALERT_DIR = "data/alerts"
 
@@ -49,8 +50,8 @@ def save_alerts(alerts):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filepath = os.path.join(ALERT_DIR, f"alerts_{timestamp}.json")
     
-    with open(filepath, 'w') as f:
-        json.dump(alerts, f, indent=2)
+    with open(filepath, 'wb') as f:
+        f.write(orjson.dumps(alerts, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
     
     return filepath
 
@@ -60,20 +61,24 @@ def get_recent_alerts(limit=50):
     """
     ensure_alert_dir()
     
-    alert_files = sorted(
-        [f for f in os.listdir(ALERT_DIR) if f.startswith("alerts_")],
-        reverse=True
-    )
+    # Newest files first: alerts_YYYYmmdd_HHMMSS names sort by save time,
+    # so no stat() call is needed per file
+    with os.scandir(ALERT_DIR) as it:
+        entries = [e for e in it if e.name.startswith("alerts_")]
+    # Only the last 5 files are ever read, so skip sorting the whole history
+    entries = heapq.nlargest(5, entries, key=lambda e: e.name)
     
     all_alerts = []
-    for file in alert_files[:5]:  # Read last 5 files
-        filepath = os.path.join(ALERT_DIR, file)
+    for entry in entries:
+        # Each file is one saved batch; stop once enough alerts are collected
+        if len(all_alerts) >= limit:
+            break
         try:
-            with open(filepath, 'r') as f:
-                alerts = json.load(f)
+            with open(entry.path, 'rb') as f:
+                alerts = orjson.loads(f.read())
                 all_alerts.extend(alerts)
         except Exception as e:
-            print(f"Error reading {file}: {e}")
+            print(f"Error reading {entry.name}: {e}")
     
     return all_alerts[:limit]
 
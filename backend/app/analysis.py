@@ -107,6 +107,17 @@ def generate_threat_score(row):
     
     return min(score, 100)
 
+def _numeric_column(df, column):
+    """
+    Return a column as a float32 array (missing column or NaN -> 0)
+    """
+    if column not in df.columns:
+        return np.zeros(len(df), dtype=np.float32)
+    return df[column].to_numpy(dtype=np.float32, na_value=0)
+
+SEVERITY_BINS = [-1, 40, 60, 80, 101]
+SEVERITY_LABELS = ["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+
 def calculate_severity(df):
     """
     Calculate severity levels for anomalies
@@ -114,18 +125,18 @@ def calculate_severity(df):
     if "is_anomaly" not in df.columns:
         return df
     
-    df["threat_score"] = df.apply(generate_threat_score, axis=1)
-    
-    def get_severity(score):
-        if score >= 80:
-            return "CRITICAL"
-        elif score >= 60:
-            return "HIGH"
-        elif score >= 40:
-            return "MEDIUM"
-        else:
-            return "LOW"
-    
-    df["severity"] = df["threat_score"].apply(get_severity)
+    # Same weights as generate_threat_score, computed column-wise
+    score = (
+        50 * (_numeric_column(df, "is_anomaly") != 0) +
+        15 * (_numeric_column(df, "pkt_rate") > 100) +
+        15 * (_numeric_column(df, "byte_rate") > 10000) +
+        20 * (_numeric_column(df, "unique_dst_ports") > 10)
+    )
+    df["threat_score"] = np.minimum(score, 100).astype(int)
+    
+    # Bins are left-closed: 40 -> MEDIUM, 60 -> HIGH, 80 -> CRITICAL
+    df["severity"] = pd.cut(
+        df["threat_score"], bins=SEVERITY_BINS, labels=SEVERITY_LABELS, right=False
+    ).astype(str)
     
     return df
\ No newline at end of file
@@ -1,6 +1,8 @@
-from scapy.all import rdpcap, IP, TCP, UDP
+import sys
+from scapy.all import PcapReader, IP, TCP, UDP
+import numpy as np
 import pandas as pd
-from collections import defaultdict
+from array import array
 from datetime import datetime
 
 def extract_flows_from_pcap(pcap_path):
@@ -8,89 +10,141 @@ def extract_flows_from_pcap(pcap_path):
     Enhanced flow extraction with more features
     """
     try:
-        packets = rdpcap(pcap_path)
+        reader = PcapReader(pcap_path)
     except Exception as e:
         print(f"❌ Error reading PCAP: {e}")
         return pd.DataFrame()
 
-    flows = defaultdict(lambda: {
-        "pkt_count": 0,
-        "byte_count": 0,
-        "tcp_count": 0,
-        "udp_count": 0,
-        "start_time": None,
-        "end_time": None,
-        "src_ports": set(),
-        "dst_ports": set(),
-        "flags": [],
-        "payload_sizes": []
-    })
+    # Per-packet fields, aggregated into flows in one groupby pass below
+    srcs = []
+    dsts = []
+    protos = array("B")
+    sizes = array("I")
+    times = array("d")
+    l4 = array("B")          # 1 = TCP, 2 = UDP, 0 = other
+    sports = array("H")      # 0 when not TCP/UDP (see l4)
+    dports = array("H")
+    payloads = array("i")    # -1 when there is no Raw layer
 
-    for pkt in packets:
-        if IP in pkt:
-            src = pkt[IP].src
-            dst = pkt[IP].dst
-            proto = pkt[IP].proto
-            size = len(pkt)
-            timestamp = float(pkt.time)
+    # Stream packets instead of loading the whole capture into memory
+    with reader:
+        for pkt in reader:
+            # Skip non-IP frames (ARP, LLDP, ...) before touching the buffers
+            if IP not in pkt:
+                continue
 
-            # Flow key (bidirectional)
-            flow_key = tuple(sorted([src, dst])) + (proto,)
+            ip = pkt[IP]
 
-            # Update flow statistics
-            flows[flow_key]["pkt_count"] += 1
-            flows[flow_key]["byte_count"] += size
-            
-            # Track time
-            if flows[flow_key]["start_time"] is None:
-                flows[flow_key]["start_time"] = timestamp
-            flows[flow_key]["end_time"] = timestamp
+            # Flow key (bidirectional): lower address first, interned so the
+            # repeated strings hash once and share storage
+            src = sys.intern(ip.src)
+            dst = sys.intern(ip.dst)
+            if dst < src:
+                src, dst = dst, src
+            srcs.append(src)
+            dsts.append(dst)
+            protos.append(ip.proto)
+            sizes.append(len(pkt))
+            times.append(float(pkt.time))
 
             # Protocol-specific features
             if TCP in pkt:
-                flows[flow_key]["tcp_count"] += 1
-                flows[flow_key]["src_ports"].add(pkt[TCP].sport)
-                flows[flow_key]["dst_ports"].add(pkt[TCP].dport)
-                flows[flow_key]["flags"].append(pkt[TCP].flags)
-                
+                l4.append(1)
+                sports.append(pkt[TCP].sport)
+                dports.append(pkt[TCP].dport)
             elif UDP in pkt:
-                flows[flow_key]["udp_count"] += 1
-                flows[flow_key]["src_ports"].add(pkt[UDP].sport)
-                flows[flow_key]["dst_ports"].add(pkt[UDP].dport)
+                l4.append(2)
+                sports.append(pkt[UDP].sport)
+                dports.append(pkt[UDP].dport)
+            else:
+                l4.append(0)
+                sports.append(0)
+                dports.append(0)
 
             # Payload size
             if pkt.haslayer("Raw"):
-                flows[flow_key]["payload_sizes"].append(len(pkt["Raw"].load))
+                payloads.append(len(pkt["Raw"].load))
+            else:
+                payloads.append(-1)
+
+    if not srcs:
+        print("✅ Extracted 0 flows with enhanced features")
+        return pd.DataFrame()
+
+    l4 = np.frombuffer(l4, dtype=np.uint8)
+    has_ports = l4 > 0
+    sports = np.frombuffer(sports, dtype=np.uint16)
+    dports = np.frombuffer(dports, dtype=np.uint16)
+    payloads = np.frombuffer(payloads, dtype=np.int32)
+    has_payload = payloads >= 0
+
+    packets = pd.DataFrame({
+        "src": srcs,
+        "dst": dsts,
+        "ip_proto": np.frombuffer(protos, dtype=np.uint8),
+        "size": np.frombuffer(sizes, dtype=np.uint32),
+        "ts": np.frombuffer(times, dtype=np.float64),
+        "is_tcp": l4 == 1,
+        "is_udp": l4 == 2,
+        # Packets without ports get -1, which is discounted after nunique
+        "sport": np.where(has_ports, sports, -1).astype(np.int32),
+        "dport": np.where(has_ports, dports, -1).astype(np.int32),
+        "no_ports": ~has_ports,
+        # Only the mean payload is needed, so keep a sum and a count
+        "payload": np.where(has_payload, payloads, 0).astype(np.int64),
+        "has_payload": has_payload,
+    })
+
+    # Aggregate all flows in one pass (sort=False keeps first-seen order)
+    flows = packets.groupby(["src", "dst", "ip_proto"], sort=False).agg(
+        pkt_count=("size", "size"),
+        byte_count=("size", "sum"),
+        tcp_count=("is_tcp", "sum"),
+        udp_count=("is_udp", "sum"),
+        start_time=("ts", "first"),
+        end_time=("ts", "last"),
+        unique_src_ports=("sport", "nunique"),
+        unique_dst_ports=("dport", "nunique"),
+        any_no_ports=("no_ports", "any"),
+        payload_sum=("payload", "sum"),
+        payload_n=("has_payload", "sum"),
+    ).reset_index()
 
     # Convert to DataFrame with enhanced features
-    rows = []
-    for (src, dst, proto), stats in flows.items():
-        # Calculate duration
-        duration = stats["end_time"] - stats["start_time"] if stats["end_time"] else 0
-        
-        # Calculate rates
-        pkt_rate = stats["pkt_count"] / duration if duration > 0 else 0
-        byte_rate = stats["byte_count"] / duration if duration > 0 else 0
-        
-        # Calculate averages
-        avg_payload = sum(stats["payload_sizes"]) / len(stats["payload_sizes"]) if stats["payload_sizes"] else 0
-        
-        rows.append({
-            "src": src,
-            "dst": dst,
-            "proto": "TCP" if stats["tcp_count"] > 0 else ("UDP" if stats["udp_count"] > 0 else "OTHER"),
-            "pkt_count": stats["pkt_count"],
-            "byte_count": stats["byte_count"],
-            "duration": round(duration, 3),
-            "pkt_rate": round(pkt_rate, 2),
-            "byte_rate": round(byte_rate, 2),
-            "unique_src_ports": len(stats["src_ports"]),
-            "unique_dst_ports": len(stats["dst_ports"]),
-            "avg_payload_size": round(avg_payload, 2),
-            "tcp_flags_count": len(stats["flags"]),
-            "start_time": datetime.fromtimestamp(stats["start_time"]).strftime("%Y-%m-%d %H:%M:%S") if stats["start_time"] else None,
-        })
+    duration = (flows["end_time"] - flows["start_time"]).to_numpy()
+    has_duration = duration > 0
+    safe_duration = np.where(has_duration, duration, 1.0)
+    pkt_rate = np.where(has_duration, flows["pkt_count"].to_numpy() / safe_duration, 0.0)
+    byte_rate = np.where(has_duration, flows["byte_count"].to_numpy() / safe_duration, 0.0)
+    port_sentinel = flows["any_no_ports"].to_numpy(dtype=np.int32)
+    payload_n = flows["payload_n"].to_numpy()
+    avg_payload = np.where(payload_n > 0, flows["payload_sum"].to_numpy() / np.maximum(payload_n, 1), 0.0)
+
+    proto = np.select(
+        [flows["tcp_count"].to_numpy() > 0, flows["udp_count"].to_numpy() > 0],
+        ["TCP", "UDP"],
+        default="OTHER",
+    )
+
+    # Columns are built with explicit dtypes so pandas does not re-infer them
+    df = pd.DataFrame({
+        "src": flows["src"].to_numpy(dtype=object),
+        "dst": flows["dst"].to_numpy(dtype=object),
+        "proto": proto.astype(object),
+        "pkt_count": flows["pkt_count"].to_numpy(dtype=np.int32),
+        "byte_count": flows["byte_count"].to_numpy(dtype=np.int64),
+        "duration": np.round(duration, 3),
+        "pkt_rate": np.round(pkt_rate, 2),
+        "byte_rate": np.round(byte_rate, 2),
+        "unique_src_ports": flows["unique_src_ports"].to_numpy(dtype=np.int32) - port_sentinel,
+        "unique_dst_ports": flows["unique_dst_ports"].to_numpy(dtype=np.int32) - port_sentinel,
+        "avg_payload_size": np.round(avg_payload, 2),
+        "tcp_flags_count": flows["tcp_count"].to_numpy(dtype=np.int32),
+        "start_time": [
+            datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S") if t else None
+            for t in flows["start_time"]
+        ],
+    })
 
-    df = pd.DataFrame(rows)
     print(f"✅ Extracted {len(df)} flows with enhanced features")
-    return df
\ No newline at end of file
+    return df
@@ -1,15 +1,20 @@
 # backend/app/main.py
 import os
-import json
+import shutil
+import asyncio
+import threading
 import traceback
+import orjson
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 
 from .feature_extract import extract_flows_from_pcap
-from .model import predict_scores_and_confidence
+from .model import predict_scores_and_confidence, preload_models
 # keep your analysis and alert modules
 from .analysis import analyze_flows, detect_anomaly_patterns, calculate_severity
 from .alert_system import generate_alert, save_alerts, get_recent_alerts, generate_alert_summary
@@ -17,7 +22,8 @@ from .alert_system import generate_alert, save_alerts, get_recent_alerts, genera
 app = FastAPI(
     title="Network Anomaly Detection API",
     description="Enhanced API for analyzing network traffic from PCAP files",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
@@ -30,11 +36,38 @@ app.add_middleware(
 
 MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
 os.makedirs("data/uploads", exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+FLOW_STREAM_CHUNK_ROWS = 5000
+
+_RNG = np.random.default_rng()
+STABILITY_RUNS = 3
+
+# Shared by every request, so concurrent uploads together keep model
+# inference at or below the core count (a thread semaphore, taken inside
+# the worker thread, so it is not tied to any one event loop)
+_inference_slots = threading.BoundedSemaphore(os.cpu_count() or 1)
+
+def _predict_throttled(data, model_name):
+    with _inference_slots:
+        return predict_scores_and_confidence(data, model_name)
+
+# Derived frames (df.assign, shallow copies) share column data until written
+pd.options.mode.copy_on_write = True
+
+# (MODELS_DIR mtime, model names) from the last directory scan
+_models_cache = None
 
 def available_models():
     """
     Return the list of model names (exclude scaler files).
+    The directory is rescanned only when its mtime changes.
     """
+    global _models_cache
+    mtime = os.stat(MODELS_DIR).st_mtime
+    if _models_cache is not None and _models_cache[0] == mtime:
+        return list(_models_cache[1])
+
     models = []
     for f in os.listdir(MODELS_DIR):
         if not f.endswith(".joblib"):
@@ -43,13 +76,79 @@ def available_models():
             continue
         name = f.replace(".joblib", "")
         models.append(name)
-    return sorted(models)
+    models = sorted(models)
+    _models_cache = (mtime, models)
+    return list(models)
+
+
+# (mtime, parsed scores) of model_scores.json from the last read
+_scores_cache = None
+
+def load_model_scores(scores_file):
+    """
+    Return the training-time scores, re-reading the file only when its mtime changes.
+    """
+    global _scores_cache
+    mtime = os.stat(scores_file).st_mtime
+    if _scores_cache is None or _scores_cache[0] != mtime:
+        with open(scores_file, "rb") as fh:
+            _scores_cache = (mtime, orjson.loads(fh.read()))
+    return _scores_cache[1]
+
+
+def arrow_response(df, summary):
+    """
+    Encode the flows table as an Arrow IPC stream; every other response field
+    is stored as JSON under its own key in the schema metadata.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    for key, value in summary.items():
+        metadata[key.encode()] = orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    table = table.replace_schema_metadata(metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+def json_stream_response(df, summary):
+    """
+    Stream {"flows": [...], **summary} as JSON, encoding the flow records
+    FLOW_STREAM_CHUNK_ROWS at a time instead of building the whole body first.
+    """
+    # Encoded up front so a failure still reaches the handler's 500 response;
+    # summary is never empty, so its "{" can be swapped for the separator
+    tail = b"]," + orjson.dumps(summary, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)[1:]
+
+    def _gen():
+        yield b'{"flows":['
+        sep = b""
+        for start in range(0, len(df), FLOW_STREAM_CHUNK_ROWS):
+            chunk = df.iloc[start:start + FLOW_STREAM_CHUNK_ROWS]
+            # orjson writes the shortest round-trip floats; strip the "[...]"
+            # brackets to splice the chunks into one array
+            records = orjson.dumps(chunk.to_dict(orient="records"),
+                                   option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)[1:-1]
+            yield sep + records
+            sep = b","
+        yield tail
+
+    return StreamingResponse(_gen(), media_type="application/json")
+
+
+@app.on_event("startup")
+def warm_model_cache():
+    # Unpickle every model once at startup so the first upload is not slowed down
+    preload_models(available_models())
 
 @app.post("/upload_pcap/")
 async def upload_pcap(
     file: UploadFile = File(...),
     model: str = Query(None, description="Optional single model to use (overrides multi-model eval)"),
-    conf_thresh: float = Query(60.0, description="Confidence threshold (0-100) used for classification")
+    conf_thresh: float = Query(60.0, description="Confidence threshold (0-100) used for classification"),
+    response_format: str = Query("json", alias="format", description="Response format: json (default) or arrow")
 ):
     """
     Uploads a PCAP, extracts flows, runs all available models on the UPLOADED file,
@@ -57,18 +156,24 @@ async def upload_pcap(
       - flows (with default model predictions attached),
       - statistics, patterns, alerts,
       - model_evaluations: per-model metrics computed on uploaded flows.
+    With format=arrow the flows are returned as an Arrow IPC stream and the
+    remaining fields are stored as JSON in the schema metadata.
     """
+    if response_format not in ("json", "arrow"):
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {response_format}")
+
     dest = f"data/uploads/{file.filename}"
     try:
+        # Copy in 1 MiB chunks on a worker thread so disk writes don't block the event loop
         with open(dest, "wb") as buffer:
-            buffer.write(await file.read())
+            await run_in_threadpool(shutil.copyfileobj, file.file, buffer, UPLOAD_CHUNK_SIZE)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Unable to save uploaded file: {e}")
 
     try:
-        df = extract_flows_from_pcap(dest)
+        df = await run_in_threadpool(extract_flows_from_pcap, dest)
         if df is None or len(df) == 0:
-            return JSONResponse(content={
+            return ORJSONResponse(content={
                 "flows": [],
                 "message": "No valid network flows found in file.",
                 "statistics": {},
@@ -81,20 +186,54 @@ async def upload_pcap(
         df = df.reset_index(drop=True)
 
         # Determine which models to evaluate
-        model_list = available_models()
+        all_models = available_models()
+        model_list = all_models
         if model is not None:
             model_list = [m for m in model_list if m == model]
 
         model_evals = {}
-        preds_matrix = {}
 
-        # Evaluate each model on this uploaded dataset
-        for model_name in model_list:
+        # Thresholded labels per model (row i = model_list[i]), 1 anomaly / 0 normal
+        n_flows = len(df)
+        labels_arr = np.zeros((len(model_list), n_flows), dtype=np.int8)
+        labels_ok = np.zeros(len(model_list), dtype=bool)
+
+        # Model inference runs in the threadpool so the event loop stays free
+        async def _predict_async(data, model_name):
+            return await run_in_threadpool(_predict_throttled, data, model_name)
+
+        # Predictions on the unmodified flows, shared by evaluation and the response
+        pred_cache = {}
+
+        async def _predict(model_name):
+            if model_name not in pred_cache:
+                pred_cache[model_name] = await _predict_async(df, model_name)
+            return pred_cache[model_name]
+
+        # Noisy copies of the flows for the stability check: all noise is drawn
+        # in one call and the same perturbed frames are shared by every model
+        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+        X_base = df[numeric_cols].to_numpy(dtype=np.float32)
+        stds = df[numeric_cols].std().to_numpy(dtype=np.float32)
+        stds = np.where(stds > 0, stds, 1.0).astype(np.float32)
+        noise = _RNG.standard_normal((STABILITY_RUNS, *X_base.shape), dtype=np.float32) * (0.01 * stds)
+
+        noisy_frames = []
+        for i in range(STABILITY_RUNS):
+            noisy = df.copy(deep=False)
+            noisy[numeric_cols] = X_base + noise[i]
+            noisy_frames.append(noisy)
+
+        async def _eval_model(model_name):
+            """
+            Evaluate one model on the uploaded flows.
+            Returns (evaluation dict, thresholded labels or None on error).
+            """
             try:
-                preds, scores, confidences, infer_time = predict_scores_and_confidence(df, model_name=model_name)
-                preds = np.array(preds)
-                scores = np.array(scores, dtype=float)
-                confidences = np.array(confidences, dtype=float)
+                preds, scores, confidences, infer_time = await _predict(model_name)
+                preds = np.asarray(preds)
+                scores = np.asarray(scores, dtype=float)
+                confidences = np.asarray(confidences, dtype=float)
 
                 anomalies_count = int((preds == -1).sum())
                 mean_conf = float(np.mean(confidences)) if confidences.size > 0 else 0.0
@@ -111,16 +250,11 @@ async def upload_pcap(
 
                 # Stability: repeated runs with small perturbation of numeric cols
                 stability_checks = []
-                numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
 
-                for _ in range(3):
-                    noisy = df.copy()
-                    for c in numeric_cols:
-                        col_std = noisy[c].std() if noisy[c].std() > 0 else 1.0
-                        noisy[c] = noisy[c] + np.random.normal(0, 0.01 * col_std, size=len(noisy))
+                for noisy in noisy_frames:
                     try:
-                        n_preds, _, n_conf, _ = predict_scores_and_confidence(noisy, model_name=model_name)
-                        n_conf = np.array(n_conf)
+                        n_preds, _, n_conf, _ = await _predict_async(noisy, model_name)
+                        n_conf = np.asarray(n_conf)
                         orig_label = (confidences >= conf_thresh).astype(int)
                         new_label = (n_conf >= conf_thresh).astype(int)
                         stability_checks.append((orig_label == new_label).mean())
@@ -129,11 +263,10 @@ async def upload_pcap(
 
                 stability_pct = round(np.mean(stability_checks) * 100.0, 2)
 
-                # store thresholded labels (1 anomaly, 0 normal)
+                # thresholded labels (1 anomaly, 0 normal)
                 threshold_labels = (confidences >= conf_thresh).astype(int)
-                preds_matrix[model_name] = threshold_labels
 
-                model_evals[model_name] = {
+                return {
                     "inference_time_sec": round(float(infer_time), 6),
                     "anomalies_detected": int(anomalies_count),
                     "mean_confidence": round(mean_conf, 2),
@@ -144,27 +277,30 @@ async def upload_pcap(
                     "pseudo_accuracy_pct": None,
                     "high_conf_anomalies": high_conf_anomaly_count,
                     "predicted_anomalies_by_conf_thresh": predicted_anomaly_count
-                }
+                }, threshold_labels
 
             except Exception as me:
                 tb = traceback.format_exc()
                 print(f"❌ Error evaluating model {model_name} on uploaded file:\n{tb}")
-                model_evals[model_name] = {"error": str(me), "traceback": tb}
+                return {"error": str(me), "traceback": tb}, None
+
+        # Evaluate all models on this uploaded dataset concurrently
+        results = await asyncio.gather(*[_eval_model(m) for m in model_list])
+        for i, (model_name, (evaluation, threshold_labels)) in enumerate(zip(model_list, results)):
+            model_evals[model_name] = evaluation
+            if threshold_labels is not None:
+                labels_arr[i] = threshold_labels
+                labels_ok[i] = True
 
         # Compute majority consensus and per-model pseudo-accuracy
         try:
-            if preds_matrix:
-                labels_arr = np.array([preds_matrix[m] for m in sorted(preds_matrix.keys())])
-                majority = (labels_arr.sum(axis=0) >= (labels_arr.shape[0] / 2)).astype(int)
-                for model_name in model_evals:
-                    if "error" in model_evals[model_name]:
-                        continue
-                    labels = preds_matrix.get(model_name)
-                    if labels is None:
-                        model_evals[model_name]["pseudo_accuracy_pct"] = None
-                    else:
-                        acc = round(float((labels == majority).mean() * 100.0), 2)
-                        model_evals[model_name]["pseudo_accuracy_pct"] = acc
+            if labels_ok.any():
+                ok_labels = labels_arr[labels_ok]
+                majority = ok_labels.sum(axis=0) * 2 >= ok_labels.shape[0]
+                accs = (ok_labels == majority).mean(axis=1) * 100.0
+                ok_models = [m for m, ok in zip(model_list, labels_ok) if ok]
+                for model_name, acc in zip(ok_models, accs):
+                    model_evals[model_name]["pseudo_accuracy_pct"] = round(float(acc), 2)
             else:
                 for m in model_evals:
                     model_evals[m]["pseudo_accuracy_pct"] = None
@@ -175,59 +311,44 @@ async def upload_pcap(
                     model_evals[m]["pseudo_accuracy_pct"] = None
 
         # Prepare flows output: attach predictions from a selected model or default first model
-        selected_model = model if model is not None else (available_models()[0] if available_models() else None)
-        flows_with_predictions = []
+        selected_model = model if model is not None else (all_models[0] if all_models else None)
+        # df.assign shares the flow columns with df instead of deep-copying them
         if selected_model:
             try:
-                preds, scores, confidences, _ = predict_scores_and_confidence(df, model_name=selected_model)
-                df_out = df.copy()
-                df_out["is_anomaly"] = (np.array(preds) == -1).tolist()
-                df_out["anomaly_score"] = [float(s) for s in scores]
-                df_out["confidence"] = [float(c) for c in confidences]
+                preds, scores, confidences, _ = await _predict(selected_model)
+                df_out = df.assign(
+                    is_anomaly=np.asarray(preds) == -1,
+                    anomaly_score=np.asarray(scores, dtype=float),
+                    confidence=np.asarray(confidences, dtype=float)
+                )
             except Exception:
                 tb = traceback.format_exc()
                 print("❌ Error predicting flows for response:\n", tb)
-                df_out = df.copy()
-                df_out["is_anomaly"] = False
-                df_out["anomaly_score"] = 0.0
-                df_out["confidence"] = 0.0
+                df_out = df.assign(is_anomaly=False, anomaly_score=0.0, confidence=0.0)
         else:
-            df_out = df.copy()
-            df_out["is_anomaly"] = False
-            df_out["anomaly_score"] = 0.0
-            df_out["confidence"] = 0.0
+            df_out = df.assign(is_anomaly=False, anomaly_score=0.0, confidence=0.0)
 
         # ------------------------------
         # Add 'reason' for anomalous flows (R3)
         # ------------------------------
-        # initialize column
-        df_out["reason"] = None
-
         # mark reasons for detected anomalies using same logic as your alert generation
-        anomalies_df = df_out[(df_out["is_anomaly"] == True)].copy()
-        for idx, flow in anomalies_df.iterrows():
-            pattern_type = "anomaly"
-            try:
-                if flow.get("unique_dst_ports", 0) > 10:
-                    pattern_type = "port_scan"
-                elif flow.get("pkt_rate", 0) > 100:
-                    pattern_type = "ddos_suspect"
-                elif "byte_count" in df_out.columns and flow.get("byte_count", 0) > df_out["byte_count"].quantile(0.95):
-                    pattern_type = "data_exfiltration"
-            except Exception:
-                pattern_type = "anomaly"
-
-            df_out.at[idx, "reason"] = pattern_type
-
-            # generate alert from original flow dict (use already-enriched df_out row)
-            try:
-                alert = generate_alert(flow.to_dict(), pattern_type, flow.get("severity", "MEDIUM"))
-                # append alert (we will add below)
-            except Exception:
-                pass
+        # (first matching condition wins; non-anomalous flows are "normal")
+        zeros = pd.Series(0, index=df_out.index)
+        is_anom = (df_out["is_anomaly"] == True).to_numpy()
+        udp = df_out.get("unique_dst_ports", zeros).fillna(0).to_numpy()
+        pkt_rate = df_out.get("pkt_rate", zeros).fillna(0).to_numpy()
+        if "byte_count" in df_out.columns:
+            byte_count = df_out["byte_count"].fillna(0).to_numpy()
+            q95_bytes = df_out["byte_count"].quantile(0.95)
+        else:
+            byte_count = zeros.to_numpy()
+            q95_bytes = np.inf
 
-        # fill normal flows reason
-        df_out["reason"] = df_out["reason"].fillna("normal")
+        df_out["reason"] = np.select(
+            [is_anom & (udp > 10), is_anom & (pkt_rate > 100), is_anom & (byte_count > q95_bytes), is_anom],
+            ["port_scan", "ddos_suspect", "data_exfiltration", "anomaly"],
+            default="normal",
+        ).astype(object)
 
         # Run existing analysis pipeline on df_out
         try:
@@ -243,11 +364,12 @@ async def upload_pcap(
         # Generate alerts list (from df_analyzed anomalies)
         alerts = []
         try:
+            # pattern type comes from the vectorized "reason" column computed above
             anomalies_for_alerts = df_analyzed[df_analyzed.get("is_anomaly") == True]
-            for _, flow in anomalies_for_alerts.iterrows():
-                ptype = flow.get("reason", "anomaly")
-                alert = generate_alert(flow.to_dict(), ptype, flow.get("severity", "MEDIUM"))
-                alerts.append(alert)
+            alerts = [
+                generate_alert(flow, flow.get("reason", "anomaly"), flow.get("severity", "MEDIUM"))
+                for flow in anomalies_for_alerts.to_dict(orient="records")
+            ]
             if alerts:
                 save_alerts(alerts)
         except Exception:
@@ -255,8 +377,7 @@ async def upload_pcap(
             print("❌ Error generating alerts:\n", tb)
             alerts = []
 
-        response = {
-            "flows": df_analyzed.to_dict(orient="records"),
+        summary = {
             "statistics": statistics,
             "patterns": patterns,
             "alerts": alerts,
@@ -264,12 +385,15 @@ async def upload_pcap(
             "model_evaluations": model_evals
         }
 
-        return JSONResponse(content=response)
+        if response_format == "arrow":
+            return arrow_response(df_analyzed, summary)
+
+        return json_stream_response(df_analyzed, summary)
 
     except Exception as e:
         tb = traceback.format_exc()
         print("❌ Exception while processing upload_pcap:\n", tb)
-        return JSONResponse(status_code=500, content={"error": str(e), "traceback": tb})
+        return ORJSONResponse(status_code=500, content={"error": str(e), "traceback": tb})
 
 
 @app.get("/model/scores")
@@ -278,13 +402,11 @@ def model_scores():
         scores_file = os.path.join(MODELS_DIR, "model_scores.json")
         if not os.path.exists(scores_file):
             return {"error": "Model scores file not found. Run train_model.py first."}
-        with open(scores_file, "r") as fh:
-            data = json.load(fh)
-        return {"scores": data}
+        return {"scores": load_model_scores(scores_file)}
     except Exception as e:
         tb = traceback.format_exc()
         print("❌ Exception in model_scores:\n", tb)
-        return JSONResponse(status_code=500, content={"error": str(e), "traceback": tb})
+        return ORJSONResponse(status_code=500, content={"error": str(e), "traceback": tb})
 
 
 @app.get("/alerts/")
@@ -310,7 +432,7 @@ def root():
         "status": "running",
         "message": "Network Anomaly Detection API v2.0 🚀",
         "endpoints": {
-            "/upload_pcap/": "Upload and analyze PCAP files (supports conf_thresh param)",
+            "/upload_pcap/": "Upload and analyze PCAP files (supports conf_thresh and format=json|arrow params)",
             "/model/scores": "Get training-time model scores",
             "/alerts/": "Get recent alerts",
             "/health": "Health check"
@@ -4,6 +4,7 @@ Model utilities: load model+scaler and produce predictions, anomaly scores and c
 """
 
 import os
+import functools
 import joblib
 import numpy as np
 import pandas as pd
@@ -18,16 +19,39 @@ DEFAULT_MODEL = "isolation_forest"
 def _model_path_for_name(name):
     return os.path.join(MODELS_DIR, f"{name}.joblib")
 
+@functools.lru_cache(maxsize=4)
+def _load_model_cached(model_path, model_mtime):
+    # mtime is part of the cache key so a retrained model is picked up
+    return joblib.load(model_path)
+
+@functools.lru_cache(maxsize=1)
+def _load_scaler_cached(scaler_mtime):
+    # One scaler is shared by every model, so it is cached on its own
+    return joblib.load(SCALER_PATH)
+
 def _load_model_and_scaler(model_name=DEFAULT_MODEL):
+    """
+    Return (model, scaler), unpickled once per process and reused afterwards.
+    """
     model_path = _model_path_for_name(model_name)
     if not os.path.exists(model_path):
         raise FileNotFoundError(f"Model not found: {model_path}")
     if not os.path.exists(SCALER_PATH):
         raise FileNotFoundError(f"Scaler not found: {SCALER_PATH}")
-    model = joblib.load(model_path)
-    scaler = joblib.load(SCALER_PATH)
+    model = _load_model_cached(model_path, os.path.getmtime(model_path))
+    scaler = _load_scaler_cached(os.path.getmtime(SCALER_PATH))
     return model, scaler
 
+def preload_models(model_names):
+    """
+    Load the given models (and the scaler) into the cache ahead of the first request.
+    """
+    for name in model_names:
+        try:
+            _load_model_and_scaler(name)
+        except Exception as e:
+            print(f"❌ Error preloading model {name}: {e}")
+
 def _prepare_features(df):
     feature_columns = ["pkt_count", "byte_count"]
     optional_features = ["pkt_rate", "byte_rate", "unique_src_ports",
@@ -38,15 +62,19 @@ def _prepare_features(df):
     missing = [c for c in ["pkt_count", "byte_count"] if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required features: {missing}")
-    X = df[feature_columns].fillna(0).replace([np.inf, -np.inf], 0)
+    # NaN/inf are zeroed in place in a single pass over the array
+    arr = df[feature_columns].to_numpy(dtype=np.float64, copy=True)
+    np.nan_to_num(arr, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    # keep column names: the scaler was fitted on a DataFrame
+    X = pd.DataFrame(arr, columns=feature_columns, copy=False)
     return X, feature_columns
 
 def predict_scores_and_confidence(df, model_name=None):
     """
     Predict using a named model and return:
       - preds: array (1 normal, -1 anomaly)
-      - anomaly_scores: higher == more anomalous
-      - confidences: 0-100 normalized confidence (higher => more confident anomaly)
+      - anomaly_scores: float array, higher == more anomalous
+      - confidences: float array, 0-100 normalized confidence (higher => more confident anomaly)
       - inference_time (seconds) for prediction step (not including scaling)
     """
     if isinstance(df, list):
@@ -58,7 +86,9 @@ def predict_scores_and_confidence(df, model_name=None):
     model, scaler = _load_model_and_scaler(model_to_use)
 
     X, feat_cols = _prepare_features(df)
-    X_scaled = scaler.transform(X)
+    # The scaler returns a column-major array; lay it out row-major once so
+    # predict and decision_function don't each convert it again
+    X_scaled = np.ascontiguousarray(scaler.transform(X), dtype=np.float64)
 
     t0 = time.time()
     preds = model.predict(X_scaled)
@@ -73,7 +103,7 @@ def predict_scores_and_confidence(df, model_name=None):
         # fallback: use negative of predictions (anomaly -> 1)
         anomaly_scores = (-preds).astype(float)
 
-    anomaly_scores = np.array(anomaly_scores, dtype=float)
+    anomaly_scores = np.asarray(anomaly_scores, dtype=float)
 
     # Normalize confidence: map anomaly_scores to 0-100
     s_min = anomaly_scores.min() if anomaly_scores.size > 0 else 0.0
@@ -85,4 +115,4 @@ def predict_scores_and_confidence(df, model_name=None):
 
     confidences = np.round(normalized, 2)
 
-    return preds.astype(int), anomaly_scores.tolist(), confidences.tolist(), round(inference_time, 6)
+    return preds.astype(int), anomaly_scores, confidences, round(inference_time, 6)